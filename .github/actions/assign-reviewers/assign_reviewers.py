@@ -2,16 +2,56 @@
 import os
 import sys
 import json
+import functools
+import http.client
+import random
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from fnmatch import fnmatch
 
-try:
-    from github import Github, GithubException
-except ImportError:
-    print("Error: PyGithub is not installed")
-    print("Install with: pip install PyGithub")
-    sys.exit(1)
+API_HOST = 'api.github.com'
+
+CHANGED_FILES_QUERY = """
+query($owner: String!, $name: String!, $number: Int!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      files(first: 100, after: $cursor) {
+        pageInfo { hasNextPage endCursor }
+        nodes { path }
+      }
+    }
+  }
+}
+"""
+
+# Rate limited requests are retried with exponential backoff plus jitter,
+# unless the limit resets further away than RETRY_MAX_WAIT seconds
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF = 2
+RETRY_JITTER = 1
+RETRY_MAX_WAIT = 60
+
+EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+# Resolved emails are trusted for 30 days before being looked up again,
+# emails that could not be resolved are retried after a day
+EMAIL_CACHE_TTL = 30 * 24 * 60 * 60
+EMAIL_MISS_CACHE_TTL = 24 * 60 * 60
+
+# Emails per aliased GraphQL query; batches are sent in parallel
+EMAIL_BATCH_SIZE = 20
+EMAIL_BATCH_WORKERS = 4
+
+# At most EMAIL_BATCH_WORKERS searches start within any SEARCH_WINDOW seconds
+SEARCH_WINDOW = 2
+search_slots = threading.Semaphore(EMAIL_BATCH_WORKERS)
+
+# Patterns matching every file; rules before the last one never take effect
+CATCH_ALL_PATTERNS = frozenset({'*', '**', '/*', '/**'})
+
+GLOB_CHARS_RE = re.compile(r'[*?[\\]')
 
 
 def parse_reviewers_file(file_path):
@@ -22,63 +62,473 @@ def parse_reviewers_file(file_path):
     - email@domain.com
     - @org/team
 
-    Returns list of (pattern, reviewers) tuples.
+    Returns (rules, has_emails): rules is a list of (pattern, reviewers)
+    tuples, has_emails tells whether any reviewer is an email.
     Last matching pattern takes precedence (like CODEOWNERS).
     """
     rules = []
+    has_emails = False
 
     with open(file_path, 'r') as f:
         for line in f:
-            line = line.strip()
-
-            # Skip empty lines and comments
-            if not line or line.startswith('#'):
-                continue
+            # Split pattern from reviewers; surrounding whitespace is ignored
+            parts = line.split(None, 1)
 
-            # Split pattern and reviewers
-            parts = line.split()
-            if len(parts) < 2:
+            # Skip empty lines, comments and patterns without reviewers
+            if len(parts) < 2 or parts[0].startswith('#'):
                 continue
 
             pattern = parts[0]
-            reviewers = parts[1:]
+            reviewers = parts[1].split()
 
             rules.append((pattern, reviewers))
+            has_emails = has_emails or any(EMAIL_RE.match(r) for r in reviewers)
 
-    return rules
+    return rules, has_emails
 
 
-def email_to_username(email, gh, repo_name):
-    """Convert email to GitHub username using multiple strategies.
+def load_cache(cache_path):
+    """Load a JSON cache file.
 
-    1. Search users by email (works for public emails)
-    2. Search commits in repo (works for private emails with commits)
+    A missing or unreadable cache file yields an empty cache.
     """
-    # Strategy 1: Search users by email
     try:
-        users = gh.search_users(f"{email} in:email")
-        for user in users:
-            print(f"  ✓ Resolved {email} -> @{user.login}")
-            return user.login
-    except GithubException:
-        pass
-
-    # Strategy 2: Search commits by email in repo
+        with open(cache_path, 'r') as f:
+            cache = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+    return cache if isinstance(cache, dict) else {}
+
+
+def save_cache(cache_path, cache):
+    """Write a JSON cache file back to disk."""
+    try:
+        Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_path, 'w') as f:
+            json.dump(cache, f, indent=2, sort_keys=True)
+    except OSError as e:
+        print(f"  ⚠ Could not write cache '{cache_path}': {e}")
+
+
+def load_email_cache(cache_path):
+    """Load the email -> username cache, dropping expired entries.
+
+    Schema: {email: {"login": str or null, "resolved_at": epoch}}, a null
+    login recording an email that could not be resolved. Malformed entries
+    are dropped as well.
+    """
+    now = time.time()
+    cache = {}
+
+    for email, entry in load_cache(cache_path).items():
+        if not isinstance(entry, dict):
+            continue
+        login, resolved_at = entry.get('login'), entry.get('resolved_at')
+        if not isinstance(resolved_at, (int, float)):
+            continue
+        if login is None:
+            ttl = EMAIL_MISS_CACHE_TTL
+        elif isinstance(login, str) and login:
+            ttl = EMAIL_CACHE_TTL
+        else:
+            continue
+        if now - resolved_at < ttl:
+            cache[email] = entry
+
+    return cache
+
+
+class GitHubError(Exception):
+    """A GitHub API request failed (error status or connection failure)."""
+
+
+class GitHubSession:
+    """Minimal GitHub API client.
+
+    Default headers are set once, and each thread keeps a single
+    keep-alive HTTPS connection to the API host, so all requests made by
+    a thread share one TLS handshake.
+    """
+
+    def __init__(self, token):
+        self.headers = {
+            'Authorization': f'Bearer {token}',
+            'Accept': 'application/vnd.github+json',
+            'Content-Type': 'application/json',
+            'User-Agent': 'assign-reviewers',
+        }
+        self.local = threading.local()
+
+    def connection(self, reconnect=False):
+        """Return this thread's connection, opening a new one if needed."""
+        conn = getattr(self.local, 'connection', None)
+        if conn is None or reconnect:
+            if conn is not None:
+                conn.close()
+            conn = http.client.HTTPSConnection(API_HOST, timeout=30)
+            self.local.connection = conn
+        return conn
+
+    def send(self, method, path, body, headers):
+        """Send one request and return (response, payload).
+
+        The server may have closed an idle keep-alive connection, so the
+        request is retried once on a fresh connection before giving up.
+        """
+        for attempt in range(2):
+            conn = self.connection(reconnect=attempt > 0)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                return response, response.read()
+            except (OSError, http.client.HTTPException) as e:
+                if attempt:
+                    conn.close()
+                    raise GitHubError(f"{method} {path}: {e}") from e
+
+    def request(self, method, path, data=None):
+        """Send a request to the GitHub API.
+
+        path is an API path (e.g. /graphql). data, if given, is sent as a
+        JSON body. Rate limited requests are retried (see retry_delay).
+        Returns (response headers, decoded JSON body or None); the headers
+        carry the rate limit state. Error statuses raise GitHubError.
+        """
+        body = json.dumps(data).encode() if data is not None else None
+
+        for attempt in range(RETRY_ATTEMPTS + 1):
+            response, payload = self.send(method, path, body, self.headers)
+            if response.status < 300:
+                break
+
+            message = error_message(payload)
+            rate_limited = is_rate_limited(response.status, response.headers, message)
+            delay = retry_delay(response.headers, attempt) if rate_limited else None
+            if delay is None or attempt == RETRY_ATTEMPTS:
+                raise GitHubError(
+                    f"{method} {path}: HTTP {response.status} {message or response.reason}"
+                )
+
+            print(f"  ⚠ Rate limited on {method} {path}, retrying in {delay:.0f}s")
+            time.sleep(delay)
+
+        try:
+            return response.headers, json.loads(payload) if payload else None
+        except ValueError as e:
+            raise GitHubError(f"{method} {path}: invalid JSON response") from e
+
+
+def error_message(payload):
+    """Return the "message" of a GitHub error response body, if any."""
+    try:
+        return json.loads(payload).get('message') or ''
+    except (ValueError, AttributeError):
+        return ''
+
+
+def is_rate_limited(status, headers, message):
+    """Check whether a failed REST response is a (primary or secondary)
+    rate limit rather than e.g. a permission error."""
+    if status not in (403, 429):
+        return False
+
+    return (status == 429 or 'Retry-After' in headers
+            or headers.get('X-RateLimit-Remaining') == '0'
+            or 'rate limit' in message.lower())
+
+
+def retry_delay(headers, attempt):
+    """Return how long to wait before retrying a rate limited request, or
+    None to give up.
+
+    - Retry-After given (secondary limit): wait as told
+    - X-RateLimit-Remaining is 0 (primary limit): wait until
+      X-RateLimit-Reset, giving up if that is more than RETRY_MAX_WAIT away
+    - Otherwise (secondary limit without hint): exponential backoff
+
+    Jitter is added so parallel requests do not retry in lockstep.
+    """
+    retry_after = headers.get('Retry-After', '')
+    reset = headers.get('X-RateLimit-Reset', '')
+
+    if retry_after.isdigit():
+        delay = int(retry_after)
+    elif headers.get('X-RateLimit-Remaining') == '0' and reset.isdigit():
+        delay = max(1, int(reset) - time.time())
+    else:
+        delay = RETRY_BACKOFF * 2 ** attempt
+
+    if delay > RETRY_MAX_WAIT:
+        return None
+
+    return delay + random.uniform(0, RETRY_JITTER)
+
+
+def get_path(data, *keys):
+    """Follow keys (dict keys or list indices) into data, None if absent."""
+    for key in keys:
+        try:
+            data = data[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return data
+
+
+def graphql_query(query, session, variables=None, required=()):
+    """Run a GraphQL query against the GitHub API and return its data.
+
+    required is a path of keys (see get_path) the caller cannot do
+    without; if it is missing, GitHubError is raised as for missing data.
+
+    GraphQL reports failures as HTTP 200 with an "errors" list. Rate
+    limited queries (RATE_LIMITED errors) are retried like rate limited
+    REST requests (see retry_delay). A response without data raises
+    GitHubError with the error messages; partial errors (e.g. one
+    unresolvable alias) are logged and the usable data is still returned.
+    """
+    request = {'query': query}
+    if variables:
+        request['variables'] = variables
+
+    for attempt in range(RETRY_ATTEMPTS + 1):
+        headers, result = session.request('POST', '/graphql', data=request)
+
+        errors = result.get('errors') or []
+        if not any(error.get('type') == 'RATE_LIMITED' for error in errors):
+            break
+
+        delay = retry_delay(headers, attempt)
+        if delay is None or attempt == RETRY_ATTEMPTS:
+            break
+
+        print(f"  ⚠ GraphQL query rate limited, retrying in {delay:.0f}s")
+        time.sleep(delay)
+
+    messages = [error.get('message', '') for error in result.get('errors') or []]
+    if get_path(result.get('data'), *required) is None:
+        missing = '.'.join(map(str, required)) or 'data'
+        raise GitHubError(f"GraphQL query failed: {'; '.join(messages) or f'no {missing} returned'}")
+
+    for message in messages:
+        print(f"  ⚠ GraphQL error: {message}")
+
+    return result['data']
+
+
+def get_changed_files(repo_name, pr_number, base_sha, head_sha, session, cache_path):
+    """Return the paths of all files changed in a pull request.
+
+    Only the path of each file is requested (GraphQL, 100 per page), not
+    the patches and stats the REST endpoint returns. The list is cached
+    per base/head commit pair, which fully determines it, so a rerun for
+    the same commits makes no request.
+
+    Cache schema: {"<base_sha>..<head_sha>": {"files": [str]}}
+    """
+    key = f'{base_sha}..{head_sha}'
+    cached = load_cache(cache_path).get(key) or {}
+    if isinstance(cached.get('files'), list):
+        print("  ✓ Changed files unchanged since last run (cached)")
+        return cached['files']
+
+    owner, name = repo_name.split('/', 1)
+    variables = {'owner': owner, 'name': name, 'number': pr_number, 'cursor': None}
+    files = []
+
+    while True:
+        path = ('repository', 'pullRequest', 'files')
+        page = get_path(graphql_query(CHANGED_FILES_QUERY, session, variables, path), *path)
+
+        files.extend(node['path'] for node in page['nodes'])
+        if not page['pageInfo']['hasNextPage']:
+            break
+        variables['cursor'] = page['pageInfo']['endCursor']
+
+    save_cache(cache_path, {key: {'files': files}})
+    return files
+
+
+def get_author_identifiers(pr_user, session, lookup_email=True):
+    """Return the frozenset of lower-cased identifiers the PR author may
+    appear as.
+
+    Covers the login (with and without @) and any email known for the
+    author: the one in the event payload and, when lookup_email is set,
+    the public profile email (one /users/{login} request).
+    """
+    login = pr_user['login'].lower()
+    identifiers = {login, f'@{login}'}
+    emails = [pr_user.get('email')]
+
+    if lookup_email:
+        try:
+            _, user = session.request('GET', f"/users/{pr_user['login']}")
+            emails.append(user.get('email'))
+        except GitHubError:
+            pass
+
+    identifiers.update(email.lower() for email in emails if email)
+    return frozenset(identifiers)
+
+
+def acquire_search_slot():
+    """Block until a search may start without exceeding the search rate."""
+    search_slots.acquire()
+    timer = threading.Timer(SEARCH_WINDOW, search_slots.release)
+    timer.daemon = True
+    timer.start()
+
+
+def search_query(query, session):
+    """Run a rate-limited GraphQL search; a failed search yields no data."""
+    acquire_search_slot()
     try:
-        commits = gh.search_commits(f"author-email:{email} repo:{repo_name}")
-        for commit in commits:
-            if commit.author:
-                username = commit.author.login
-                print(f"  ✓ Resolved {email} -> @{username} (via commits)")
-                return username
-    except GithubException:
-        pass
+        return graphql_query(query, session)
+    except GitHubError as e:
+        print(f"  ⚠ Search failed: {e}")
+        return {}
 
-    print(f"  ⚠ Could not resolve email: {email}")
-    return None
 
+def search_users_by_email(emails, session, repo_name):
+    """Search users by email (works for public emails).
 
-def resolve_reviewers(reviewers, gh, repo_name):
+    One GraphQL request with an aliased user search per email.
+    Returns dict of email -> username, or None for emails the search
+    answered without a match; emails whose search failed are left out.
+    """
+    fields = ' '.join(
+        f'e{i}: search(query: {json.dumps(email + " in:email")}, type: USER, first: 1) '
+        '{ nodes { ... on User { login } } }'
+        for i, email in enumerate(emails)
+    )
+    data = search_query(f'query {{ {fields} }}', session)
+
+    resolved = {}
+    for i, email in enumerate(emails):
+        if get_path(data, f'e{i}') is None:
+            continue
+        login = get_path(data, f'e{i}', 'nodes', 0, 'login')
+        resolved[email] = login
+        if login:
+            print(f"  ✓ Resolved {email} -> @{login}")
+
+    return resolved
+
+
+def search_commits_by_email(emails, session, repo_name):
+    """Search default branch commits by author email (works for private
+    emails with commits).
+
+    One GraphQL request with an aliased history lookup per email.
+    Returns dict of email -> username, or None for emails the lookup
+    answered without a match; emails whose lookup failed are left out.
+    """
+    owner, name = repo_name.split('/', 1)
+    fields = ' '.join(
+        f'c{i}: history(first: 1, author: {{emails: [{json.dumps(email)}]}}) '
+        '{ nodes { author { user { login } } } }'
+        for i, email in enumerate(emails)
+    )
+    query = (
+        f'query {{ repository(owner: {json.dumps(owner)}, name: {json.dumps(name)}) '
+        f'{{ defaultBranchRef {{ target {{ ... on Commit {{ {fields} }} }} }} }} }}'
+    )
+    data = search_query(query, session)
+
+    resolved = {}
+    target = get_path(data, 'repository', 'defaultBranchRef', 'target')
+    for i, email in enumerate(emails):
+        if get_path(target, f'c{i}') is None:
+            continue
+        login = get_path(target, f'c{i}', 'nodes', 0, 'author', 'user', 'login')
+        resolved[email] = login
+        if login:
+            print(f"  ✓ Resolved {email} -> @{login} (via commits)")
+
+    return resolved
+
+
+def search_in_batches(search, emails, session, repo_name):
+    """Run search over emails in batches of EMAIL_BATCH_SIZE.
+
+    Batches run in parallel on up to EMAIL_BATCH_WORKERS threads.
+    Returns the merged dict of email -> username (None if not found).
+    """
+    batches = [
+        emails[i:i + EMAIL_BATCH_SIZE]
+        for i in range(0, len(emails), EMAIL_BATCH_SIZE)
+    ]
+    if len(batches) == 1:
+        return search(batches[0], session, repo_name)
+
+    resolved = {}
+    with ThreadPoolExecutor(max_workers=EMAIL_BATCH_WORKERS) as executor:
+        for result in executor.map(lambda batch: search(batch, session, repo_name), batches):
+            resolved.update(result)
+
+    return resolved
+
+
+def resolve_emails_bulk(emails, session, repo_name, cache=None):
+    """Convert emails to GitHub usernames using batched GraphQL queries.
+
+    0. Look up the email cache, if given (no API call)
+    1. Search users by email (works for public emails)
+    2. Search default branch commits by author email (works for private
+       emails with commits), only for emails left unresolved by step 1
+
+    Each step sends one aliased query per batch of emails, with batches
+    running in parallel. Newly resolved emails are written back to the
+    cache, and so are emails both searches answered without a match, so
+    they are not searched again until the miss expires. Returns dict of
+    email -> username for the emails that resolved.
+    """
+    resolved = {}
+    if cache is None:
+        cache = {}
+
+    for email in emails:
+        if email not in cache:
+            continue
+        login = cache[email]['login']
+        if login is None:
+            print(f"  ⚠ Could not resolve email: {email} (cached)")
+        else:
+            resolved[email] = login
+            print(f"  ✓ Resolved {email} -> @{login} (cached)")
+
+    # email -> username, or None once the last search found no match
+    found = {}
+    for search in (search_users_by_email, search_commits_by_email):
+        remaining = [email for email in emails
+                     if email not in cache and not found.get(email)]
+        if not remaining:
+            break
+        answers = search_in_batches(search, remaining, session, repo_name)
+        for email in remaining:
+            if email in answers:
+                found[email] = answers[email]
+            else:
+                found.pop(email, None)
+
+    now = time.time()
+    for email in emails:
+        if email in cache:
+            continue
+        if found.get(email):
+            resolved[email] = found[email]
+        else:
+            print(f"  ⚠ Could not resolve email: {email}")
+        # Failed searches are not cached, so they are retried next run
+        if email in found:
+            cache[email] = {'login': found[email], 'resolved_at': now}
+
+    return resolved
+
+
+def resolve_reviewers(reviewers, session, repo_name, cache=None,
+                      author_identifiers=frozenset(), has_emails=True):
     """Resolve reviewer identifiers to GitHub usernames.
 
     Handles:
@@ -86,57 +536,270 @@ def resolve_reviewers(reviewers, gh, repo_name):
     - username -> username
     - email@domain.com -> username (via API lookup)
     - @org/team -> org/team
-    """
-    email_pattern = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
 
-    resolved = []
-    teams = []
+    All emails are collected first and resolved in one batch, consulting
+    the email cache before any API call. Identifiers in author_identifiers
+    (lower-cased) are skipped without being resolved. When has_emails is
+    false, no identifier is checked for being an email.
+    """
+    # Partition into (kind, value) up front, keeping the original order
+    entries = []
+    emails = []
 
     for reviewer in reviewers:
+        # PR author: never requested, so never resolved
+        if reviewer.lower() in author_identifiers:
+            print(f"  ℹ Skipping PR author: {reviewer}")
         # Team: @org/team-name
-        if '/' in reviewer:
-            teams.append(reviewer.lstrip('@'))
+        elif '/' in reviewer:
+            entries.append(('team', reviewer.lstrip('@')))
         # Email: convert to username
-        elif email_pattern.match(reviewer):
-            username = email_to_username(reviewer, gh, repo_name)
-            if username:
-                resolved.append(username)
+        elif has_emails and EMAIL_RE.match(reviewer):
+            entries.append(('email', reviewer))
+            emails.append(reviewer)
         # Username: strip @ prefix if present
         else:
-            resolved.append(reviewer.lstrip('@'))
+            entries.append(('user', reviewer.lstrip('@')))
+
+    usernames = resolve_emails_bulk(emails, session, repo_name, cache) if emails else {}
+
+    resolved = []
+    teams = []
+
+    for kind, value in entries:
+        if kind == 'team':
+            teams.append(value)
+        elif kind == 'email':
+            if value in usernames:
+                resolved.append(usernames[value])
+        else:
+            resolved.append(value)
 
     return resolved, teams
 
 
+def translate_class(chars):
+    """Translate the contents of a [...] class to a regex.
+
+    A leading ! or ^ negates the class, which never matches a slash.
+    Ranges are handled like fnmatch.translate(): a - at either end is
+    literal, reversed ranges (z-a) match nothing, and everything else
+    that is special inside a regex set is escaped.
+    """
+    negate = chars[:1] in ('!', '^')
+    if negate:
+        chars = chars[1:]
+
+    # Split on range hyphens, starting after the first member so that a
+    # leading - (or ]) stays literal
+    chunks = []
+    start, k = 0, 1
+    while chars:
+        k = chars.find('-', k)
+        if k < 0:
+            break
+        chunks.append(chars[start:k])
+        start = k + 1
+        k += 3
+    if chars[start:]:
+        chunks.append(chars[start:])
+    elif chunks:
+        chunks[-1] += '-'
+
+    # Drop reversed ranges, which are invalid in a regex
+    for k in reversed(range(1, len(chunks))):
+        if chunks[k - 1][-1] > chunks[k][0]:
+            chunks[k - 1] = chunks[k - 1][:-1] + chunks[k][1:]
+            del chunks[k]
+
+    chars = '-'.join(re.sub(r'([\\\[\]&~|-])', r'\\\1', chunk) for chunk in chunks)
+
+    if negate:
+        return f'[^/{chars}]'
+    # Empty class: matches nothing
+    return f'[{chars}]' if chars else '(?!)'
+
+
+def translate_segment(segment):
+    """Translate one path segment of a glob to a regex.
+
+    * and ? never match a slash; [...] classes and backslash escapes are
+    supported.
+    """
+    regex = ''
+    i, n = 0, len(segment)
+
+    while i < n:
+        c = segment[i]
+        i += 1
+
+        if c == '*':
+            regex += '[^/]*'
+        elif c == '?':
+            regex += '[^/]'
+        elif c == '\\' and i < n:
+            regex += re.escape(segment[i])
+            i += 1
+        elif c == '[':
+            j = i
+            if j < n and segment[j] in '!^':
+                j += 1
+            if j < n and segment[j] == ']':
+                j += 1
+            j = segment.find(']', j)
+
+            # Unterminated class: treat "[" literally
+            if j < 0:
+                regex += re.escape(c)
+                continue
+
+            regex += translate_class(segment[i:j])
+            i = j + 1
+        else:
+            regex += re.escape(c)
+
+    return regex
+
+
+@functools.lru_cache(maxsize=None)
+def translate_pattern(pattern):
+    """Translate a CODEOWNERS pattern to an anchored regex.
+
+    Results are cached, so a pattern repeated across rules is only
+    translated once.
+
+    Follows gitignore semantics:
+    - A leading or inner slash anchors the pattern to the repository root,
+      otherwise it matches at any depth
+    - A trailing slash only matches directories
+    - ** matches across directories (leading, trailing or between slashes)
+    - A pattern matching a directory also matches everything below it
+    """
+    anchored = '/' in pattern.rstrip('/')
+    dir_only = pattern.endswith('/')
+    segments = pattern.strip('/').split('/')
+
+    regex = '' if anchored or segments[0] == '**' else '(?:.*/)?'
+
+    for i, segment in enumerate(segments):
+        last = i == len(segments) - 1
+        if segment == '**':
+            regex += '.*' if last else '(?:.*/)?'
+        else:
+            regex += translate_segment(segment) + ('' if last else '/')
+
+    regex += '/.*' if dir_only else '(?:/.*)?'
+
+    return f'(?s:{regex})\\Z'
+
+
+def is_literal_dir_pattern(pattern):
+    """Check for an anchored directory pattern without glob characters.
+
+    Such a rule (e.g. /drivers/ or src/net/) matches exactly the files
+    whose path starts with its directory, so it needs no regex.
+    """
+    return (pattern.endswith('/') and '/' in pattern.rstrip('/')
+            and not GLOB_CHARS_RE.search(pattern))
+
+
+def compile_rules(rules):
+    """Compile all rule patterns for matching each file in one pass.
+
+    Literal directory rules go into a dict keyed by directory prefix
+    ("dir/sub/"). All other patterns are joined into one regex with a
+    named group per rule, ordered from the last rule to the first, so the
+    group that matches belongs to the rule that takes precedence
+    (CODEOWNERS behavior). Rules shadowed by a later catch-all pattern are
+    left out, and so are rules whose pattern is not a valid regex once
+    translated (logged).
+
+    Returns (regex or None, dir_rules, reviewers_by_rule) where dir_rules
+    maps a prefix to the last rule index for it, group r<i> maps to
+    reviewers_by_rule[i], and reviewers_by_rule only holds the rules that
+    can match.
+    """
+    first = max(
+        (i for i, (pattern, _) in enumerate(rules) if pattern in CATCH_ALL_PATTERNS),
+        default=0,
+    )
+    alternatives = []
+    dir_rules = {}
+    reviewers_by_rule = {}
+
+    for i in reversed(range(first, len(rules))):
+        pattern, reviewers = rules[i]
+        if is_literal_dir_pattern(pattern):
+            prefix = pattern.strip('/') + '/'
+            # An earlier rule for the same directory never takes precedence
+            if prefix in dir_rules:
+                continue
+            dir_rules[prefix] = i
+        else:
+            alternative = f'(?P<r{i}>{translate_pattern(pattern)})'
+            # Check each rule on its own so one bad line cannot break the rest
+            try:
+                re.compile(alternative)
+            except re.error as e:
+                print(f"  ⚠ Skipping invalid pattern '{pattern}': {e}")
+                continue
+            alternatives.append(alternative)
+
+        reviewers_by_rule[i] = reviewers
+
+    combined = re.compile('|'.join(alternatives)) if alternatives else None
+    return combined, dir_rules, reviewers_by_rule
+
+
+def find_dir_rule(file_path, dir_rules):
+    """Return the last directory rule matching file_path, or -1.
+
+    Looks up each parent directory of the file, so the cost depends on
+    the path depth rather than on the number of rules.
+    """
+    rule = -1
+    end = file_path.find('/')
+
+    while end >= 0:
+        rule = max(rule, dir_rules.get(file_path[:end + 1], -1))
+        end = file_path.find('/', end + 1)
+
+    return rule
+
+
 def match_files_to_reviewers(changed_files, rules):
     """Match changed files against rules and return list of reviewers.
 
     Last matching pattern takes precedence (CODEOWNERS behavior).
     """
-    all_reviewers = []
+    combined, dir_rules, reviewers_by_rule = compile_rules(rules)
+    if not reviewers_by_rule:
+        return []
+
+    # Ordered set: deduplicates while keeping first-match order
+    all_reviewers = {}
+    matched_rules = set()
 
     for file_path in changed_files:
-        matched_reviewers = []
+        rule = find_dir_rule(file_path, dir_rules) if dir_rules else -1
+
+        if combined is not None:
+            match = combined.match(file_path)
+            if match and match.lastgroup:
+                rule = max(rule, int(match.lastgroup[1:]))
 
-        # Find all matching patterns (last one wins)
-        for pattern, pattern_reviewers in rules:
-            # Normalize pattern: remove leading slash if present
-            normalized_pattern = pattern.lstrip('/')
+        if rule < 0:
+            continue
 
-            # Handle directory patterns with proper boundary matching
-            if normalized_pattern.endswith('/'):
-                dir_pattern = normalized_pattern.rstrip('/')
-                # Check if file is in this directory
-                if file_path.startswith(dir_pattern + '/') or file_path == dir_pattern:
-                    matched_reviewers = pattern_reviewers
-            # Handle glob patterns
-            elif fnmatch(file_path, normalized_pattern):
-                matched_reviewers = pattern_reviewers
+        if rule not in matched_rules:
+            matched_rules.add(rule)
+            all_reviewers.update(dict.fromkeys(reviewers_by_rule[rule]))
 
-        all_reviewers.extend(matched_reviewers)
+        # Every rule has matched, the remaining files cannot add reviewers
+        if len(matched_rules) == len(reviewers_by_rule):
+            break
 
-    # Remove duplicates
-    return list(set(all_reviewers))
+    return list(all_reviewers)
 
 
 def main():
@@ -147,6 +810,8 @@ def main():
         sys.exit(1)
 
     config_path = os.environ.get('INPUT_CONFIG', 'REVIEWERS')
+    cache_path = os.environ.get('INPUT_CACHE', '.github/.reviewer-cache.json')
+    files_cache_path = os.environ.get('INPUT_FILES_CACHE', '.github/.pr-files-cache.json')
 
     # Get PR information from GitHub event
     event_path = os.environ.get('GITHUB_EVENT_PATH')
@@ -166,6 +831,8 @@ def main():
         pr_number = event['pull_request']['number']
         repo_name = event['repository']['full_name']
         pr_author = event['pull_request']['user']['login']
+        base_sha = event['pull_request']['base']['sha']
+        head_sha = event['pull_request']['head']['sha']
     except KeyError as e:
         print(f"Error: Missing required field in GitHub event: {e}")
         sys.exit(1)
@@ -174,24 +841,24 @@ def main():
     print(f"PR Author: {pr_author}")
 
     # Initialize GitHub client
-    try:
-        gh = Github(github_token)
-        repo = gh.get_repo(repo_name)
-        pr = repo.get_pull(pr_number)
-    except GithubException as e:
-        print(f"Error accessing GitHub API: {e}")
-        sys.exit(1)
+    session = GitHubSession(github_token)
 
     # Parse reviewers file
     if not Path(config_path).exists():
         print(f"Error: Config file '{config_path}' not found")
         sys.exit(1)
 
-    rules = parse_reviewers_file(config_path)
+    rules, has_emails = parse_reviewers_file(config_path)
     print(f"Loaded {len(rules)} reviewer rule(s)")
 
     # Get changed files
-    changed_files = [f.filename for f in pr.get_files()]
+    try:
+        changed_files = get_changed_files(
+            repo_name, pr_number, base_sha, head_sha, session, files_cache_path
+        )
+    except GitHubError as e:
+        print(f"Error fetching changed files: {e}")
+        sys.exit(1)
     print(f"Changed files: {', '.join(changed_files)}")
 
     # Match files to reviewers
@@ -204,12 +871,33 @@ def main():
     print(f"Matched reviewers: {', '.join(matched_reviewers)}")
 
     # Resolve reviewers (emails, usernames, teams)
-    reviewers, teams = resolve_reviewers(matched_reviewers, gh, repo_name)
-
-    # Remove PR author from reviewers list
-    filtered_reviewers = [r for r in reviewers if r != pr_author]
-
-    if pr_author in reviewers:
+    # Only look up the author's public email if it would save an email
+    # lookup; cached emails resolving to the author are filtered afterwards
+    email_cache = load_email_cache(cache_path) if has_emails else {}
+    author_identifiers = get_author_identifiers(
+        event['pull_request']['user'], session,
+        lookup_email=has_emails and any(
+            EMAIL_RE.match(r) and r not in email_cache for r in matched_reviewers
+        ),
+    )
+    # Remember the author's emails so later runs need no profile lookup;
+    # they then resolve from the cache and are filtered out below
+    for reviewer in matched_reviewers:
+        if (has_emails and reviewer.lower() in author_identifiers
+                and EMAIL_RE.match(reviewer)
+                and not email_cache.get(reviewer, {}).get('login')):
+            email_cache[reviewer] = {'login': pr_author, 'resolved_at': time.time()}
+
+    reviewers, teams = resolve_reviewers(
+        matched_reviewers, session, repo_name, email_cache, author_identifiers, has_emails
+    )
+    if has_emails:
+        save_cache(cache_path, email_cache)
+
+    # Remove PR author from reviewers list (an email may resolve to them)
+    filtered_reviewers = [r for r in reviewers if r.lower() not in author_identifiers]
+
+    if len(filtered_reviewers) != len(reviewers):
         print(f"  ℹ Skipping PR author: @{pr_author}")
 
     if not filtered_reviewers and not teams:
@@ -219,17 +907,19 @@ def main():
     reviewers = filtered_reviewers
 
     # Assign reviewers
+    url = f'/repos/{repo_name}/pulls/{pr_number}/requested_reviewers'
     try:
-        if reviewers:
-            pr.create_review_request(reviewers=reviewers)
-            print(f"✓ Assigned reviewers: {', '.join(reviewers)}")
-        if teams:
-            pr.create_review_request(team_reviewers=teams)
-            print(f"✓ Assigned teams: {', '.join(teams)}")
-    except GithubException as e:
+        # Users and teams are requested in a single call
+        session.request('POST', url, data={'reviewers': reviewers, 'team_reviewers': teams})
+    except GitHubError as e:
         print(f"Error assigning reviewers: {e}")
         sys.exit(1)
 
+    if reviewers:
+        print(f"✓ Assigned reviewers: {', '.join(reviewers)}")
+    if teams:
+        print(f"✓ Assigned teams: {', '.join(teams)}")
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+import json
+import os
+import re
+import tempfile
+import time
+import unittest
+
+from assign_reviewers import (
+    EMAIL_CACHE_TTL, EMAIL_MISS_CACHE_TTL, RETRY_BACKOFF, RETRY_JITTER,
+    is_rate_limited, load_email_cache, match_files_to_reviewers, retry_delay,
+    translate_pattern,
+)
+
+# (pattern, path, expected match) following gitignore/CODEOWNERS semantics
+PATTERN_CASES = [
+    # No slash: matches at any depth, files and directories
+    ('*', 'README.md', True),
+    ('*', 'a/b/c.rs', True),
+    ('*.md', 'docs/sub/x.md', True),
+    ('*.md', 'x.mdx', False),
+    ('docs', 'docs', True),
+    ('docs', 'a/docs/x.md', True),
+    ('docs', 'docsx/y', False),
+    ('?.c', 'b.c', True),
+    ('?.c', 'ab.c', False),
+
+    # Leading or inner slash: anchored to the repository root
+    ('/*.md', 'README.md', True),
+    ('/*.md', 'docs/a.md', False),
+    ('src/*.rs', 'src/y.rs', True),
+    ('src/*.rs', 'src/x/y.rs', False),
+    ('src/*.rs', 'lib/src/y.rs', False),
+    ('/a/b/c.txt', 'a/b/c.txt', True),
+    ('/a/b/c.txt', 'x/a/b/c.txt', False),
+
+    # Trailing slash: directories only
+    ('docs/', 'docs/a.md', True),
+    ('docs/', 'q/docs/r', True),
+    ('docs/', 'docs', False),
+    ('/virtio-drivers/', 'virtio-drivers/README', True),
+    ('/virtio-drivers/', 'z/virtio-drivers/f', False),
+    ('a/b/', 'a/b/c/d', True),
+    ('a/b/', 'a/b', False),
+    ('/a/*/', 'a/x/y', True),
+    ('/a/*/', 'a/x', False),
+
+    # ** across directories
+    ('**', 'a/b/c', True),
+    ('/**', 'a', True),
+    ('**/x', 'x', True),
+    ('**/x', 'q/w/x', True),
+    ('a/**', 'a/b/c.txt', True),
+    ('a/**', 'b/a/c', False),
+    ('a/**/c.txt', 'a/c.txt', True),
+    ('a/**/c.txt', 'a/x/b/c.txt', True),
+    ('src/**/*.rs', 'src/a/b/c.rs', True),
+    ('src/**/*.rs', 'src/a/b/c.c', False),
+
+    # Bracket classes
+    ('*.[ch]', 'foo.h', True),
+    ('*.[ch]', 'foo.o', False),
+    ('[ab]*', 'b.c', True),
+    ('[ab]*', 'c.b', False),
+    ('[!a]*', 'b.c', True),
+    ('[!a]*', 'ab', False),
+    ('[^a]*', 'b.c', True),
+    ('[]]x', ']x', True),
+    ('[]a]x', 'ax', True),
+    ('[!]]x', 'ax', True),
+    ('[!]]x', ']x', False),
+    ('[^]]x', 'bx', True),
+    ('x[!a]y', 'x/y', False),
+    ('[a-c]x', 'bx', True),
+    ('[!a-c]x', 'dx', True),
+    ('[a-]x', '-x', True),
+    ('[a-c-e]x', 'ex', True),
+    ('[a-c-e]x', 'dx', False),
+    ('[z-a]*', 'zebra', False),
+    ('[z-a]*', 'a', False),
+    ('[!z-a]x', 'ax', True),
+    ('[a--]x', 'ax', False),
+    ('[a--]x', '-x', False),
+
+    # Backslash escapes
+    ('\\*.c', '*.c', True),
+    ('\\*.c', 'b.c', False),
+]
+
+# (rules, changed files, expected reviewers): the last matching rule wins
+MATCH_CASES = [
+    # Literal directory rules against globs, in both orders
+    ([('*.rs', ['@rust']), ('/kernel/', ['@kernel'])],
+     ['kernel/a.rs'], ['@kernel']),
+    ([('/kernel/', ['@kernel']), ('*.rs', ['@rust'])],
+     ['kernel/a.rs'], ['@rust']),
+
+    # Nested directories, in both orders
+    ([('/a/', ['@a']), ('/a/b/', ['@ab'])],
+     ['a/b/c', 'a/x'], ['@ab', '@a']),
+    ([('/a/b/', ['@ab']), ('/a/', ['@a'])],
+     ['a/b/c', 'a/x'], ['@a']),
+
+    # Rules before a trailing catch-all can never win
+    ([('/docs/', ['@docs']), ('*.md', ['@md']), ('*', ['@all'])],
+     ['docs/a.md', 'README.md'], ['@all']),
+    ([('*', ['@all']), ('*.md', ['@md'])],
+     ['a.rs', 'b.md'], ['@all', '@md']),
+
+    # Reviewers are deduplicated and kept in first-match order
+    ([('*.rs', ['@b', '@a']), ('*.md', ['@c', '@b'])],
+     ['x.md', 'y.rs', 'z.md'], ['@c', '@b', '@a']),
+
+    # Unmatched files add nothing
+    ([('/src/', ['@src'])], ['docs/a.md', 'srcx/b'], []),
+    ([], ['a'], []),
+]
+
+
+class MatchFilesTest(unittest.TestCase):
+    def test_matches(self):
+        for rules, files, expected in MATCH_CASES:
+            with self.subTest(rules=rules, files=files):
+                self.assertEqual(match_files_to_reviewers(files, rules), expected)
+
+    def test_stops_once_every_rule_matched(self):
+        rules = [('*.rs', ['@rust']), ('/docs/', ['@docs'])]
+        files = iter(['a.rs', 'docs/b', 'c.rs', 'd.rs'])
+        self.assertEqual(match_files_to_reviewers(files, rules), ['@rust', '@docs'])
+        # Only the files up to the last new rule are consumed
+        self.assertEqual(list(files), ['c.rs', 'd.rs'])
+
+
+class TranslatePatternTest(unittest.TestCase):
+    def test_patterns(self):
+        for pattern, path, expected in PATTERN_CASES:
+            with self.subTest(pattern=pattern, path=path):
+                regex = re.compile(translate_pattern(pattern))
+                self.assertEqual(bool(regex.match(path)), expected)
+
+
+class RateLimitTest(unittest.TestCase):
+    def test_is_rate_limited(self):
+        reset = str(int(time.time()) + 30)
+        cases = [
+            (429, {}, '', True),
+            (403, {'Retry-After': '5'}, '', True),
+            (403, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': reset}, '', True),
+            (403, {}, 'You have exceeded a secondary rate limit', True),
+            # Permission errors and validation failures are not retried
+            (403, {'X-RateLimit-Remaining': '4999'}, 'Resource not accessible', False),
+            (422, {'Retry-After': '5'}, 'Validation Failed', False),
+            (404, {}, 'Not Found', False),
+        ]
+        for status, headers, message, expected in cases:
+            with self.subTest(status=status, headers=headers, message=message):
+                self.assertEqual(is_rate_limited(status, headers, message), expected)
+
+    def test_retry_after(self):
+        delay = retry_delay({'Retry-After': '5'}, 0)
+        self.assertGreaterEqual(delay, 5)
+        self.assertLessEqual(delay, 5 + RETRY_JITTER)
+
+    def test_reset_within_max_wait(self):
+        headers = {
+            'X-RateLimit-Remaining': '0',
+            'X-RateLimit-Reset': str(int(time.time()) + 30),
+        }
+        delay = retry_delay(headers, 0)
+        self.assertGreaterEqual(delay, 28)
+        self.assertLessEqual(delay, 30 + RETRY_JITTER)
+
+    def test_reset_beyond_max_wait(self):
+        headers = {
+            'X-RateLimit-Remaining': '0',
+            'X-RateLimit-Reset': str(int(time.time()) + 3600),
+        }
+        self.assertIsNone(retry_delay(headers, 0))
+        self.assertIsNone(retry_delay({'Retry-After': '3600'}, 0))
+
+    def test_exponential_backoff(self):
+        for attempt in range(3):
+            with self.subTest(attempt=attempt):
+                delay = retry_delay({}, attempt)
+                self.assertGreaterEqual(delay, RETRY_BACKOFF * 2 ** attempt)
+                self.assertLessEqual(delay, RETRY_BACKOFF * 2 ** attempt + RETRY_JITTER)
+
+
+class EmailCacheTest(unittest.TestCase):
+    def test_load_email_cache(self):
+        now = time.time()
+        entries = {
+            'hit@x.org': {'login': 'hit', 'resolved_at': now},
+            'miss@x.org': {'login': None, 'resolved_at': now},
+            'old-hit@x.org': {'login': 'old', 'resolved_at': now - EMAIL_CACHE_TTL - 1},
+            'old-miss@x.org': {'login': None, 'resolved_at': now - EMAIL_MISS_CACHE_TTL - 1},
+            'no-time@x.org': {'login': 'x'},
+            'bad-time@x.org': {'login': 'x', 'resolved_at': 'yesterday'},
+            'bad-login@x.org': {'login': 42, 'resolved_at': now},
+            'bad-entry@x.org': 'x',
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cache.json')
+            with open(path, 'w') as f:
+                json.dump(entries, f)
+            cache = load_email_cache(path)
+
+        self.assertEqual(sorted(cache), ['hit@x.org', 'miss@x.org'])
+
+
+if __name__ == '__main__':
+    unittest.main()